@@ -1,12 +1,18 @@
 import streamlit as st
 import google.generativeai as genai
-import json
+import bisect
+import hashlib
+import heapq
+import io
 import os
-import pandas as pd
-from PIL import Image
+import orjson
+import threading
+import numpy as np
+from PIL import Image, ImageOps
 from datetime import datetime
-import plotly.express as px
-import plotly.graph_objects as go
+from collections import Counter, defaultdict
+# pandas and plotly are imported inside the Dashboard/Analytics helpers
+# that use them, so Home, File Complaint and Track never pay their import cost
 
 # ==========================================
 # 🎨 UI CONFIGURATION
@@ -39,6 +45,11 @@ if not API_KEY:
 
 genai.configure(api_key=API_KEY)
 
+@st.cache_resource(show_spinner=False)
+def get_vision_model():
+    """Shared Gemini model handle, reused across reruns and sessions"""
+    return genai.GenerativeModel('gemini-1.5-flash')
+
 # ==========================================
 # 📊 CONSTANTS
 # ==========================================
@@ -49,6 +60,32 @@ COMPLAINT_STATUS = {
     "RESOLVED": {"label": "🟢 Resolved", "color": "#32CD32"},
     "REJECTED": {"label": "🔴 Rejected", "color": "#DC143C"}
 }
+PENDING_STATUSES = ("SUBMITTED", "ACKNOWLEDGED", "IN_PROGRESS")
+STATUS_KEYS = list(COMPLAINT_STATUS)
+STATUS_INDEX = {status: i for i, status in enumerate(STATUS_KEYS)}
+
+# Per-status display lookups; unknown or missing statuses fall back to SUBMITTED
+STATUS_LABELS = defaultdict(
+    lambda: COMPLAINT_STATUS["SUBMITTED"]["label"],
+    {status: info["label"] for status, info in COMPLAINT_STATUS.items()}
+)
+
+# Status badge markup rendered once at import instead of inside render loops
+STATUS_BADGE_HTML = defaultdict(lambda: STATUS_BADGE_HTML["SUBMITTED"], {
+    status: (
+        f'<span style="background-color: {info["color"]}; color: white; padding: 0.3rem 0.8rem; '
+        f'border-radius: 15px; font-size: 0.9rem;">{info["label"]}</span>'
+    )
+    for status, info in COMPLAINT_STATUS.items()
+})
+
+STATUS_BANNER_HTML = defaultdict(lambda: STATUS_BANNER_HTML["SUBMITTED"], {
+    status: (
+        f'<div style="background: {info["color"]}; padding: 1rem; border-radius: 10px; text-align: center;">'
+        f'<h2 style="color: white; margin: 0;">{info["label"]}</h2></div>'
+    )
+    for status, info in COMPLAINT_STATUS.items()
+})
 
 ISSUE_TYPES = [
     "Pothole", 
@@ -61,29 +98,231 @@ ISSUE_TYPES = [
     "Other"
 ]
 
+# Risk points added per context flag reported by the vision model
+RISK_FACTOR_WEIGHTS = (
+    ("near_school", 20),
+    ("heavy_traffic", 15),
+    ("water_leak", 10),
+    ("monsoon_critical", 25)
+)
+
+# Risk index cut-offs: below 50 MODERATE, 50-79 HIGH, 80+ CRITICAL
+URGENCY_THRESHOLDS = (50, 80)
+URGENCY_LEVELS = ("MODERATE", "HIGH", "CRITICAL")
+
+# Gemini downsamples internally; larger uploads only cost bandwidth
+VISION_IMAGE_SIZE = (1024, 1024)
+MAX_UPLOAD_MB = 10
+EXIF_ORIENTATION_TAG = 0x0112
+
 # ==========================================
 # 🧠 CORE FUNCTIONS
 # ==========================================
-MEMORY_FILE = "civic_memory.json"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"    # complaint and status timestamps
+MEMORY_FILE = "civic_memory.jsonl"        # one complaint record per line
+STATUS_LOG_FILE = "status_updates.jsonl"  # one status update per line
+LEGACY_MEMORY_FILE = "civic_memory.json"  # old single-array format
+STATUS_LOG_COMPACT_BYTES = 64 * 1024      # fold the status log back past ~500 updates
+COMPACTING_LOG_FILE = STATUS_LOG_FILE + ".compacting"  # status log being folded in
+COMPACTED_LOG_FILE = STATUS_LOG_FILE + ".compacted"    # folded into civic_memory.jsonl.tmp
+DASHBOARD_PAGE_SIZE = 25                  # default complaints rendered per dashboard page
+DASHBOARD_PAGE_SIZES = [10, 25, 50]
+RISK_HISTOGRAM_EDGES = np.arange(-2.5, 105, 5)  # one bar per 5 points, centred on 0..100
+TIMELINE_MAX_POINTS = 200                 # switch the timeline to weekly points beyond this
 
-def load_memory():
-    """Load complaint history from JSON file"""
-    if os.path.exists(MEMORY_FILE):
+@st.cache_resource(show_spinner=False)
+def get_memory_write_lock():
+    """One lock for every writer in this process, so compaction never races an append.
+    Re-entrant, so a writer can read through load_memory (which may migrate) while holding it."""
+    return threading.RLock()
+
+def _to_json_line(row):
+    """Compact single-line UTF-8 JSON bytes; the logs are machine-read, so no indentation"""
+    return orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE)
+
+def _read_jsonl(path):
+    """Read newline-delimited JSON, skipping blank or corrupt lines"""
+    rows = []
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    rows.append(orjson.loads(line))
+                except:
+                    continue
+    return rows
+
+def _append_jsonl(path, row):
+    """Append one compact JSON line to a log file"""
+    with get_memory_write_lock():
+        with open(path, "ab") as f:
+            f.write(_to_json_line(row))
+
+def _migrate_legacy_memory():
+    """Convert the old civic_memory.json array into the JSONL log, then set it aside
+    as civic_memory.json.migrated so it is never read (or migrated) again"""
+    with get_memory_write_lock():
+        if not os.path.exists(LEGACY_MEMORY_FILE):
+            return
         try:
-            with open(MEMORY_FILE, "r") as f:
-                return json.load(f)
+            with open(LEGACY_MEMORY_FILE, "rb") as f:
+                legacy = orjson.loads(f.read())
         except:
-            return []
-    return []
+            return
+        if not isinstance(legacy, list):
+            return
+        # Re-check under the lock so a complaint appended meanwhile is never overwritten,
+        # and never touch the log when there is nothing to write
+        if legacy and not (os.path.exists(MEMORY_FILE) and os.path.getsize(MEMORY_FILE) > 0):
+            with open(MEMORY_FILE, "wb") as f:
+                f.writelines(_to_json_line(record) for record in legacy)
+        os.replace(LEGACY_MEMORY_FILE, LEGACY_MEMORY_FILE + ".migrated")
+
+def _memory_signature():
+    """Modification times of the complaint and status logs"""
+    return tuple(
+        os.path.getmtime(path) if os.path.exists(path) else 0.0
+        for path in (MEMORY_FILE, STATUS_LOG_FILE)
+    )
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _load_memory_cached(memory_path, status_log_path, signature):
+    """Parse both logs once per file version and fold status updates into records.
+    Shared across reruns without copying, so the result must not be mutated."""
+    history = _read_jsonl(memory_path)
+    _fold_status_updates(history, _read_jsonl(status_log_path))
+    return tuple(history)
+
+def _fold_status_updates(history, updates):
+    """Apply status-log entries, in order, to the complaint records they refer to"""
+    by_id = {}
+    for record in history:
+        by_id.setdefault(record.get('complaint_id'), record)
 
-def save_memory(history):
-    """Save complaint history to JSON file"""
-    with open(MEMORY_FILE, "w") as f:
-        json.dump(history, f, indent=2)
+    for update in updates:
+        record = by_id.get(update.get('complaint_id'))
+        if record is None:
+            continue
+        record['status'] = update.get('status', record.get('status'))
+        record.setdefault('status_history', []).append({
+            "status": update.get('status'),
+            "timestamp": update.get('timestamp', '')
+        })
+        if update.get('notes'):
+            record['authority_notes'] = update['notes']
 
-def generate_complaint_id():
-    """Generate unique complaint ID"""
-    return f"PU{datetime.now().strftime('%Y%m%d%H%M%S')}"
+def load_memory():
+    """Load complaint history from the JSONL log (cached until the files change).
+    Returns a read-only tuple shared between reruns - copy a record before editing it."""
+    # Read under the lock so a compaction is never seen half-done
+    with get_memory_write_lock():
+        # Finish a compaction cut short by a crash before reading the logs
+        if os.path.exists(COMPACTING_LOG_FILE) or os.path.exists(COMPACTED_LOG_FILE):
+            _finish_compaction()
+            _invalidate_memory_caches()
+
+        # An empty log counts as missing, so an old civic_memory.json is still carried over
+        memory_empty = not os.path.exists(MEMORY_FILE) or os.path.getsize(MEMORY_FILE) == 0
+        if memory_empty and os.path.exists(LEGACY_MEMORY_FILE):
+            _migrate_legacy_memory()
+        if os.path.exists(MEMORY_FILE):
+            return _load_memory_cached(MEMORY_FILE, STATUS_LOG_FILE, _memory_signature())
+    return ()
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _memory_indexes(signature):
+    """Lookup tables built in one pass per file version (read-only, shared across reruns):
+    by_id maps complaint_id -> complaint, by_location maps case-folded location -> complaints."""
+    by_id = {}
+    by_location = defaultdict(list)
+    for record in load_memory():
+        by_id.setdefault(record.get('complaint_id'), record)
+        by_location[record.get('location', '').casefold()].append(record)
+    return {"by_id": by_id, "by_location": dict(by_location)}
+
+def get_complaint(complaint_id):
+    """O(1) lookup of a single complaint by its ID"""
+    return _memory_indexes(_memory_signature())["by_id"].get(complaint_id)
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _memory_table(signature):
+    """History plus a flat column table of its scalar fields (read-only), so filters,
+    sorts and aggregates run on arrays instead of walking nested dicts.
+    Returned together so row positions always match the records they came from."""
+    import pandas as pd
+    history = load_memory()
+    table = pd.DataFrame({
+        "complaint_id": [c.get('complaint_id', 'N/A') for c in history],
+        "timestamp": [c.get('timestamp', '') for c in history],
+        "location": [c.get('location', 'N/A') for c in history],
+        "issue_type": [c.get('issue_type', 'N/A') for c in history],
+        "status": [c.get('status') for c in history],
+        "urgency": [c.get('risk_data', {}).get('urgency') for c in history],
+        "risk_index": [c.get('risk_data', {}).get('risk_index', 0) for c in history]
+    })
+    # Parsed once per log version with the fixed record format (C parser, no inference)
+    table["filed"] = pd.to_datetime(table["timestamp"], format=TIMESTAMP_FORMAT, errors="coerce")
+    return history, table
+
+def _invalidate_memory_caches():
+    """Drop every cache derived from the complaint logs after a write"""
+    _load_memory_cached.clear()
+    _memory_indexes.clear()
+    _memory_table.clear()
+    for cached_view in (analytics_counts, build_status_chart, build_issue_chart,
+                        build_hotspots_chart, build_risk_chart, build_timeline_chart):
+        cached_view.clear()
+
+def append_record(record):
+    """Append a single new complaint to the JSONL log. IDs are only second-resolution,
+    so a clashing complaint_id gets a "-2", "-3", ... suffix (the record is updated in place)."""
+    with get_memory_write_lock():
+        base_id = record['complaint_id']
+        suffix = 1
+        while get_complaint(record['complaint_id']) is not None:
+            suffix += 1
+            record['complaint_id'] = f"{base_id}-{suffix}"
+        _append_jsonl(MEMORY_FILE, record)
+        _invalidate_memory_caches()
+
+# Strips "-", " " and ":" so "2024-12-28 12:34:56" becomes "20241228123456"
+_DIGITS_ONLY = str.maketrans("", "", "- :")
+
+def generate_complaint_id(timestamp=None):
+    """Generate unique complaint ID from a "%Y-%m-%d %H:%M:%S" timestamp"""
+    timestamp = timestamp or datetime.now().strftime(TIMESTAMP_FORMAT)
+    return "PU" + timestamp.translate(_DIGITS_ONLY)
+
+def prepare_image_for_vision(data):
+    """Downscale and JPEG-compress an uploaded photo into the inline blob sent to Gemini.
+    Passing JPEG bytes stops the SDK from re-encoding a PIL image as lossless WebP."""
+    image = Image.open(io.BytesIO(data))
+    
+    # Small, upright RGB JPEGs are already cheap to send; skip the resize and re-encode.
+    # Checked before draft(), which would report a shrunken size for large photos.
+    if (image.format == "JPEG" and image.mode == "RGB"
+            and image.width <= VISION_IMAGE_SIZE[0] and image.height <= VISION_IMAGE_SIZE[1]
+            and image.getexif().get(EXIF_ORIENTATION_TAG, 1) == 1):
+        return {"mime_type": "image/jpeg", "data": data}
+    
+    # For JPEGs, let libjpeg decode at 1/2, 1/4 or 1/8 scale instead of full resolution
+    image.draft("RGB", VISION_IMAGE_SIZE)
+    # Re-encoding drops EXIF, so bake the camera's orientation into the pixels first
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(VISION_IMAGE_SIZE, Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, "JPEG", quality=85, optimize=True)
+    return {"mime_type": "image/jpeg", "data": buffer.getvalue()}
+
+def load_uploaded_image(uploaded_file):
+    """Decode and prepare an upload once; reruns reuse it from session state"""
+    cached = st.session_state.get('uploaded_image')
+    if cached and cached[0] == uploaded_file.file_id:
+        return cached[1]
+    
+    image = prepare_image_for_vision(uploaded_file.getvalue())
+    st.session_state['uploaded_image'] = (uploaded_file.file_id, image)
+    return image
 
 def log_trace(agent_name, action):
     """Create timestamped log entry"""
@@ -93,36 +332,54 @@ def log_trace(agent_name, action):
 def risk_assessment_tool(damage_type, severity, metadata):
     """Deterministic risk calculation - no AI hallucinations"""
     try:
-        risk_score = int(severity) * 10
-        
-        # Safety rules based on context
-        if metadata.get("near_school"): 
-            risk_score += 20
-        if metadata.get("heavy_traffic"): 
-            risk_score += 15
-        if metadata.get("water_leak"): 
-            risk_score += 10
-        if metadata.get("monsoon_critical"): 
-            risk_score += 25
-        
+        # Safety rules based on context (weight table, see RISK_FACTOR_WEIGHTS)
+        risk_score = int(severity) * 10 + sum(
+            weight for factor, weight in RISK_FACTOR_WEIGHTS if metadata.get(factor)
+        )
         risk_score = min(100, risk_score)
         
         # Urgency classification
-        if risk_score >= 80: 
-            urgency = "CRITICAL"
-        elif risk_score >= 50: 
-            urgency = "HIGH"
-        else: 
-            urgency = "MODERATE"
+        urgency = URGENCY_LEVELS[bisect.bisect_right(URGENCY_THRESHOLDS, risk_score)]
         
         return {"risk_index": risk_score, "urgency": urgency}
     except:
         return {"risk_index": 50, "urgency": "MODERATE"}
 
+def _risk_inputs(record):
+    """Severity points and factor flags exactly as risk_assessment_tool reads them,
+    or None where the tool would fall back (int() fails, metadata is not a dict, ...)"""
+    try:
+        vision = record.get('vision_data', {})
+        metadata = vision.get('metadata', {})
+        flags = [bool(metadata.get(factor)) for factor, _ in RISK_FACTOR_WEIGHTS]
+        # Weights are never negative, so capping at 100 here gives the tool's min(100, ...);
+        # the floor only keeps absurd severities inside int64
+        points = max(min(int(vision.get('severity', 5)) * 10, 100), -2 ** 62)
+        return points, flags
+    except:
+        return None
+
+def risk_assessment_batch(history):
+    """Vectorized risk_assessment_tool over many complaints, using the same weight table.
+    Returns (risk_index array, urgency array); records the tool cannot score get its 50/MODERATE."""
+    inputs = [_risk_inputs(h) for h in history]
+    valid = np.array([item is not None for item in inputs], dtype=bool)
+    points = np.array([item[0] if item else 0 for item in inputs], dtype=np.int64)
+    flags = np.array([item[1] if item else [False] * len(RISK_FACTOR_WEIGHTS) for item in inputs],
+                     dtype=np.int64).reshape(len(history), len(RISK_FACTOR_WEIGHTS))
+    weights = np.array([weight for _, weight in RISK_FACTOR_WEIGHTS], dtype=np.int64)
+    
+    risk = np.minimum(points + flags @ weights, 100)
+    urgency = np.array(URGENCY_LEVELS)[np.searchsorted(URGENCY_THRESHOLDS, risk, side='right')]
+    
+    # Same fallback as risk_assessment_tool
+    risk[~valid] = 50
+    urgency[~valid] = "MODERATE"
+    return risk, urgency
+
 def get_context_summary(location):
     """Check for recurring issues at location"""
-    history = load_memory()
-    relevant = [r for r in history if r.get('location', '').lower() == location.lower()]
+    relevant = _memory_indexes(_memory_signature())["by_location"].get(location.casefold(), [])
     
     if not relevant: 
         return "No prior incidents at this location."
@@ -134,37 +391,59 @@ def get_context_summary(location):
     
     return f"History: {len(relevant)} prior reports. All resolved."
 
-def analyze_image_with_vision(image, issue_type):
-    """AI Vision Analysis using Gemini"""
+@st.cache_data(show_spinner=False, ttl="1d", max_entries=256)
+def _request_vision_analysis(image_hash, issue_type, location, context, _image):
+    """Single Gemini call for one photo, cached by image content hash so re-uploads
+    of the same photo skip the API. Raises on failure or a malformed reply, so those are never cached."""
+    vision_model = get_vision_model()
+    
+    # One request returns both the assessment and the repair plan
+    vision_prompt = f"""
+    You are a City Municipal Engineer in India.
+    Analyze this {issue_type} infrastructure image reported at: {location}.
+    Location history: {context}
+    Return ONLY valid JSON (no markdown, no extra text):
+    {{
+        "damage_type": "pothole or water leak or streetlight or garbage or drainage or road damage",
+        "severity": 5,
+        "metadata": {{
+            "near_school": false,
+            "heavy_traffic": false,
+            "water_leak": false,
+            "monsoon_critical": false
+        }},
+        "description": "Brief description of the damage",
+        "action_plan": {{
+            "immediate_actions": "Actions within 24 hours",
+            "resources": "Required crew, equipment and materials",
+            "timeline": "Estimated timeline",
+            "budget_inr": "Budget estimate in ₹"
+        }}
+    }}
+    Keep the action plan brief (max 150 words in total). Base its urgency on the severity
+    and risk factors you report and on the location history above.
+    """
+    
+    # JSON mode: Gemini returns bare JSON, so no markdown fences to strip
+    response = vision_model.generate_content(
+        [vision_prompt, _image],
+        generation_config={"response_mime_type": "application/json"}
+    )
+    
+    # Raise on malformed replies too, so only usable analyses are cached and the rest retry
+    vision_data = orjson.loads(response.text)
+    if not (isinstance(vision_data, dict) and 'severity' in vision_data
+            and isinstance(vision_data.get('metadata'), dict)):
+        raise ValueError("Gemini reply is missing severity or metadata")
+    return vision_data
+
+def analyze_image_with_vision(image, issue_type, location, context):
+    """AI Vision + Planning Analysis using a single Gemini call"""
     logs = []
-    logs.append(log_trace("Agent-V", "Analyzing image with Gemini 2.0 Vision..."))
     
     try:
-        # Use stable Gemini model
-        vision_model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        vision_prompt = f"""
-        Analyze this {issue_type} infrastructure image. Return ONLY valid JSON (no markdown, no extra text):
-        {{
-            "damage_type": "pothole or water leak or streetlight or garbage or drainage or road damage",
-            "severity": 5,
-            "metadata": {{
-                "near_school": false,
-                "heavy_traffic": false,
-                "water_leak": false,
-                "monsoon_critical": false
-            }},
-            "description": "Brief description of the damage"
-        }}
-        """
-        
-        response = vision_model.generate_content([vision_prompt, image])
-        
-        # Clean up response text
-        clean_text = response.text.strip()
-        clean_text = clean_text.replace("```json", "").replace("```", "").strip()
-        
-        vision_data = json.loads(clean_text)
+        image_hash = hashlib.blake2b(image['data'], digest_size=16).hexdigest()
+        vision_data = _request_vision_analysis(image_hash, issue_type, location, context, image)
         logs.append(log_trace("Agent-V", f"✅ Detected: {vision_data.get('damage_type', 'unknown')} (Severity: {vision_data.get('severity', 0)}/10)"))
         
         return vision_data, logs
@@ -188,93 +467,103 @@ def analyze_image_with_vision(image, issue_type):
         
         return default_data, logs
 
-def generate_action_plan(vision_data, risk_data, context, location):
-    """AI Planning Agent - generates repair plan"""
-    try:
-        planner_model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        plan_prompt = f"""
-        You are a City Municipal Engineer in India.
-        
-        COMPLAINT DETAILS:
-        - Issue: {vision_data.get('damage_type', 'unknown')}
-        - Severity: {vision_data.get('severity', 0)}/10
-        - Risk Score: {risk_data.get('risk_index', 0)}/100
-        - Urgency: {risk_data.get('urgency', 'MODERATE')}
-        - Location: {location}
-        - Context: {context}
-        
-        Provide a brief technical plan (max 150 words):
-        1. Immediate Actions (24 hours)
-        2. Required Resources
-        3. Estimated Timeline
-        4. Budget Estimate (₹)
-        """
-        
-        response = planner_model.generate_content(plan_prompt)
-        return response.text
-        
-    except Exception as e:
-        # Fallback plan
-        severity = vision_data.get('severity', 5)
-        damage = vision_data.get('damage_type', 'infrastructure damage')
-        
-        fallback_plan = f"""
-        **Immediate Actions:**
-        - Deploy inspection team within 24 hours
-        - Set up safety barriers if required
-        - Assess {damage} severity on-site
-        
-        **Resources:**
-        - 2-person inspection crew
-        - Safety equipment and materials
-        - Standard repair tools
-        
-        **Timeline:** 2-3 days for assessment and initial repairs
-        
-        **Budget:** ₹{severity * 5000}-{severity * 10000} (estimated based on severity {severity}/10)
-        
-        Note: AI planning temporarily unavailable. Manual assessment recommended.
-        """
-        
-        return fallback_plan
+def format_action_plan(plan):
+    """Render the structured action plan from Gemini as markdown"""
+    sections = [
+        ("Immediate Actions", plan.get('immediate_actions')),
+        ("Resources", plan.get('resources')),
+        ("Timeline", plan.get('timeline')),
+        ("Budget", plan.get('budget_inr'))
+    ]
+    
+    lines = []
+    for title, value in sections:
+        if not value:
+            continue
+        if isinstance(value, list):
+            lines.append(f"**{title}:**")
+            lines.extend(f"- {item}" for item in value)
+        else:
+            lines.append(f"**{title}:** {value}")
+        lines.append("")
+    
+    return "\n".join(lines).strip()
+
+def fallback_action_plan(vision_data):
+    """Rule-based repair plan used when Gemini does not return one"""
+    severity = vision_data.get('severity', 5)
+    damage = vision_data.get('damage_type', 'infrastructure damage')
+    
+    fallback_plan = f"""
+    **Immediate Actions:**
+    - Deploy inspection team within 24 hours
+    - Set up safety barriers if required
+    - Assess {damage} severity on-site
+    
+    **Resources:**
+    - 2-person inspection crew
+    - Safety equipment and materials
+    - Standard repair tools
+    
+    **Timeline:** 2-3 days for assessment and initial repairs
+    
+    **Budget:** ₹{severity * 5000}-{severity * 10000} (estimated based on severity {severity}/10)
+    
+    Note: AI planning temporarily unavailable. Manual assessment recommended.
+    """
+    
+    return fallback_plan
 
-def run_audit_pipeline(image, location, issue_type, citizen_name, citizen_phone):
-    """Main orchestration pipeline - coordinates all AI agents"""
+def run_audit_pipeline(image, location, issue_type, citizen_name, citizen_phone, progress=None):
+    """Main orchestration pipeline - coordinates all AI agents.
+    progress, if given, is called with each trace entry as soon as it is logged."""
     logs = []
     
-    # Phase 1: Vision Analysis
-    logs.append(log_trace("System", "🚀 Starting Multi-Agent Pipeline..."))
-    vision_data, vision_logs = analyze_image_with_vision(image, issue_type)
-    logs.extend(vision_logs)
+    def trace(entry):
+        logs.append(entry)
+        if progress:
+            progress(entry)
     
+    # Phase 1: Memory lookup (cached O(1) index), then Vision Analysis + Planning,
+    # so the recurring-issue summary can shape the repair plan
+    trace(log_trace("System", "🚀 Starting Multi-Agent Pipeline..."))
+    context = get_context_summary(location)
+    trace(log_trace("Agent-V", "Analyzing image with Gemini 2.0 Vision..."))
+    vision_data, vision_logs = analyze_image_with_vision(image, issue_type, location, context)
+    for entry in vision_logs:
+        trace(entry)
+
     if not vision_data:
         return None, logs
     
     # Phase 2: Risk Assessment (Deterministic)
-    logs.append(log_trace("Risk-Tool", "Calculating safety metrics..."))
+    trace(log_trace("Risk-Tool", "Calculating safety metrics..."))
     risk_data = risk_assessment_tool(
         vision_data.get('damage_type', ''), 
         vision_data.get('severity', 5), 
         vision_data.get('metadata', {})
     )
-    logs.append(log_trace("Risk-Tool", f"✅ Risk Index: {risk_data['risk_index']}/100 - Priority: {risk_data['urgency']}"))
+    trace(log_trace("Risk-Tool", f"✅ Risk Index: {risk_data['risk_index']}/100 - Priority: {risk_data['urgency']}"))
     
-    # Phase 3: Memory & Context
-    logs.append(log_trace("Agent-M", f"Checking history for '{location}'..."))
-    context = get_context_summary(location)
-    logs.append(log_trace("Agent-M", f"✅ {context}"))
+    # Phase 3: Memory & Context (looked up before the vision call)
+    trace(log_trace("Agent-M", f"Checked history for '{location}'"))
+    trace(log_trace("Agent-M", f"✅ {context}"))
     
-    # Phase 4: Action Planning
-    logs.append(log_trace("Agent-P", "Generating remediation plan..."))
-    action_plan = generate_action_plan(vision_data, risk_data, context, location)
-    logs.append(log_trace("Agent-P", "✅ Action plan generated"))
+    # Phase 4: Action Planning (returned by the same Gemini call as the vision data)
+    plan = vision_data.pop('action_plan', None)
+    if isinstance(plan, dict) and plan:
+        action_plan = format_action_plan(plan)
+        trace(log_trace("Agent-P", "✅ Action plan generated"))
+    else:
+        action_plan = fallback_action_plan(vision_data)
+        trace(log_trace("Agent-P", "⚠️ Using fallback plan - manual assessment recommended"))
     
     # Create complaint record
-    complaint_id = generate_complaint_id()
+    timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+    complaint_id = generate_complaint_id(timestamp)
     record = {
         "complaint_id": complaint_id,
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "timestamp": timestamp,
         "location": location,
         "issue_type": issue_type,
         "citizen_name": citizen_name,
@@ -285,46 +574,172 @@ def run_audit_pipeline(image, location, issue_type, citizen_name, citizen_phone)
         "context": context,
         "status": "SUBMITTED",
         "status_history": [
-            {"status": "SUBMITTED", "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+            {"status": "SUBMITTED", "timestamp": timestamp}
         ],
         "authority_notes": ""
     }
     
-    # Save to persistent memory
-    history = load_memory()
-    history.append(record)
-    save_memory(history)
+    # Save to persistent memory (a single line append) before reporting success,
+    # so a failed write reaches the caller instead of handing out an untrackable ID
+    append_record(record)
     
-    logs.append(log_trace("System", f"✅ Complaint {complaint_id} registered successfully"))
+    trace(log_trace("System", f"✅ Complaint {record['complaint_id']} registered successfully"))
     
     return record, logs
 
 def update_complaint_status(complaint_id, new_status, notes=""):
     """Update complaint status - for authority dashboard"""
-    history = load_memory()
-    updated = False
-    
-    for record in history:
-        if record.get('complaint_id') == complaint_id:
-            record['status'] = new_status
-            record['status_history'].append({
-                "status": new_status,
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })
-            if notes:
-                record['authority_notes'] = notes
-            updated = True
-            break
-    
-    if updated:
-        save_memory(history)
-    
-    return updated
+    if get_complaint(complaint_id) is None:
+        return False
+
+    # Append-only: the update is folded into the record on next load
+    _append_jsonl(STATUS_LOG_FILE, {
+        "complaint_id": complaint_id,
+        "status": new_status,
+        "timestamp": datetime.now().strftime(TIMESTAMP_FORMAT),
+        "notes": notes
+    })
+    _invalidate_memory_caches()
+
+    # File size is an O(1) proxy for the number of pending updates
+    if os.path.exists(STATUS_LOG_FILE) and os.path.getsize(STATUS_LOG_FILE) >= STATUS_LOG_COMPACT_BYTES:
+        compact_memory()
+
+    return True
+
+def _finish_compaction():
+    """Fold a set-aside status log into civic_memory.jsonl. Every step is resumable, so a
+    compaction interrupted by a crash completes on the next load and never applies an
+    update twice. Call with the write lock held."""
+    temp_file = MEMORY_FILE + ".tmp"
+    if os.path.exists(COMPACTING_LOG_FILE):
+        # Re-read from disk rather than trusting the cache
+        history = _read_jsonl(MEMORY_FILE)
+        _fold_status_updates(history, _read_jsonl(COMPACTING_LOG_FILE))
+        with open(temp_file, "wb") as f:
+            f.writelines(_to_json_line(record) for record in history)
+        # The temp file is complete: from here on the updates live only in it
+        os.replace(COMPACTING_LOG_FILE, COMPACTED_LOG_FILE)
+    if os.path.exists(COMPACTED_LOG_FILE):
+        if os.path.exists(temp_file):
+            os.replace(temp_file, MEMORY_FILE)
+        os.remove(COMPACTED_LOG_FILE)
+
+def compact_memory():
+    """Fold the status log into civic_memory.jsonl and start a fresh status log"""
+    with get_memory_write_lock():
+        _finish_compaction()
+        if os.path.exists(STATUS_LOG_FILE):
+            # Set the log aside first, so no reader or restart sees it next to its folded copy
+            os.replace(STATUS_LOG_FILE, COMPACTING_LOG_FILE)
+            _finish_compaction()
+
+    _invalidate_memory_caches()
+
+# ==========================================
+# 📈 ANALYTICS CHARTS
+# ==========================================
+# Figures are cached per version of the complaint logs, so reruns of the
+# Analytics page reuse them until a complaint is filed or updated.
+
+@st.cache_data(show_spinner=False)
+def analytics_counts(signature):
+    """Tally status, issue type, location and urgency in a single pass over the history"""
+    counts = {"status": Counter(), "issue_type": Counter(), "location": Counter(), "urgency": Counter()}
+    for record in load_memory():
+        counts["status"][record.get('status')] += 1
+        counts["issue_type"][record.get('issue_type')] += 1
+        counts["location"][record.get('location')] += 1
+        counts["urgency"][record.get('risk_data', {}).get('urgency')] += 1
+    return counts
+
+def _horizontal_count_bar(counts, colorscale, x_title, y_title, title=None):
+    """Bar chart from pre-aggregated (label, count) pairs, largest first"""
+    import plotly.graph_objects as go
+    labels = [label for label, _ in counts]
+    values = [count for _, count in counts]
+    fig = go.Figure(go.Bar(
+        x=values,
+        y=labels,
+        orientation='h',
+        marker=dict(color=values, colorscale=colorscale)
+    ))
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title=y_title, showlegend=False)
+    return fig
+
+@st.cache_data(show_spinner=False)
+def build_status_chart(signature):
+    """Pie chart of complaints by status"""
+    import plotly.express as px
+    import plotly.graph_objects as go
+    status_counts = analytics_counts(signature)["status"]
+    return go.Figure(go.Pie(
+        labels=[STATUS_LABELS[s] for s in status_counts],
+        values=list(status_counts.values()),
+        marker=dict(colors=px.colors.qualitative.Set3)
+    ))
+
+@st.cache_data(show_spinner=False)
+def build_issue_chart(signature):
+    """Horizontal bar chart of complaints by issue type"""
+    issue_counts = analytics_counts(signature)["issue_type"]
+    return _horizontal_count_bar(issue_counts.most_common(), 'Reds', 'Count', 'Issue Type')
+
+@st.cache_data(show_spinner=False)
+def build_hotspots_chart(signature):
+    """Top 10 locations by complaint volume"""
+    location_counts = analytics_counts(signature)["location"]
+    return _horizontal_count_bar(
+        location_counts.most_common(10), 'Oranges', 'Number of Complaints', 'Location',
+        title="Top 10 Locations by Complaint Volume"
+    )
+
+@st.cache_data(show_spinner=False)
+def build_risk_chart(signature):
+    """Histogram of risk scores, recomputed in one batch with the current rules.
+    Binned here so the figure carries 21 bars instead of every score."""
+    import plotly.graph_objects as go
+    risk_scores, _ = risk_assessment_batch(load_memory())
+    counts, edges = np.histogram(risk_scores, bins=RISK_HISTOGRAM_EDGES)
+    fig = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts,
+        width=edges[1] - edges[0],
+        marker=dict(color='#FF6B6B')
+    ))
+    fig.update_layout(title="Distribution of Risk Scores", xaxis_title='Risk Score', yaxis_title='Frequency', bargap=0)
+    return fig
+
+@st.cache_data(show_spinner=False)
+def build_timeline_chart(signature):
+    """Daily complaint volume, or weekly once the history spans too many days to plot"""
+    import plotly.express as px
+    _, table = _memory_table(signature)
+    filed = table['filed']
+    dates = filed.dt.date.rename('date')
+    counts = dates.groupby(dates).size().reset_index(name='count')
+    period = "Daily"
+    if len(counts) > TIMELINE_MAX_POINTS:
+        weeks = filed.dt.to_period('W').dt.start_time.dt.date.rename('date')
+        counts = weeks.groupby(weeks).size().reset_index(name='count')
+        period = "Weekly"
+    return px.line(
+        counts,
+        x='date',
+        y='count',
+        title=f"{period} Complaint Volume",
+        markers=True,
+        labels={'date': 'Date', 'count': 'Number of Complaints'},
+        # At most TIMELINE_MAX_POINTS points; avoid Plotly's automatic WebGL switch
+        render_mode='svg'
+    )
 
 # ==========================================
 # 🎨 CUSTOM CSS
 # ==========================================
-st.markdown("""
+# Streamlit drops elements a rerun doesn't emit, so the style block is re-sent
+# each run; the frontend sees an identical element and skips re-rendering it.
+CUSTOM_CSS = """
 <style>
     .main-header {
         background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
@@ -346,7 +761,97 @@ st.markdown("""
         width: 100%;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+# ==========================================
+# 🧩 DASHBOARD COMPONENTS
+# ==========================================
+def save_complaint_update(complaint_id, resolve=False):
+    """Button callback: store a card's status and notes from its widgets"""
+    new_status = 'RESOLVED' if resolve else st.session_state[f"status_{complaint_id}"]
+    authority_notes = st.session_state.get(f"notes_{complaint_id}", "")
+    if update_complaint_status(complaint_id, new_status, authority_notes):
+        # Shown by the card itself; callbacks should not draw elements
+        if resolve:
+            st.session_state[f"saved_{complaint_id}"] = "🎉 Complaint marked as RESOLVED!"
+        else:
+            st.session_state[f"saved_{complaint_id}"] = f"✅ Updated to {COMPLAINT_STATUS[new_status]['label']}"
+
+@st.fragment
+def render_complaint_card(complaint_id):
+    """One Authority Dashboard card; its widgets rerun only this card, not the whole app"""
+    # Re-read on every fragment rerun so the card shows the status it was just given
+    complaint = get_complaint(complaint_id)
+    if complaint is None:
+        return
+    
+    saved_message = st.session_state.pop(f"saved_{complaint_id}", None)
+    if saved_message:
+        st.toast(saved_message)
+    
+    with st.expander(
+        f"🆔 {complaint.get('complaint_id', 'N/A')} | {complaint.get('issue_type', 'Unknown')} | "
+        f"Risk: {complaint.get('risk_data', {}).get('risk_index', 0)} | "
+        f"{STATUS_LABELS[complaint.get('status')]}"
+    ):
+        col1, col2 = st.columns([2, 1])
+        
+        with col1:
+            st.markdown("#### 📍 Location & Details")
+            st.write(f"**Location:** {complaint.get('location', 'N/A')}")
+            st.write(f"**Citizen:** {complaint.get('citizen_name', 'N/A')} ({complaint.get('citizen_phone', 'N/A')})")
+            st.write(f"**Filed On:** {complaint.get('timestamp', 'N/A')}")
+            st.write(f"**Issue:** {complaint.get('vision_data', {}).get('damage_type', 'Unknown')}")
+            st.write(f"**Description:** {complaint.get('vision_data', {}).get('description', 'No description')}")
+            
+            st.markdown("#### 🛠️ Action Plan")
+            st.info(complaint.get('action_plan', 'No action plan available'))
+        
+        with col2:
+            st.markdown("#### 🎯 Risk Metrics")
+            st.metric("Risk Score", f"{complaint.get('risk_data', {}).get('risk_index', 0)}/100")
+            st.metric("Severity", f"{complaint.get('vision_data', {}).get('severity', 0)}/10")
+            st.metric("Urgency", complaint.get('risk_data', {}).get('urgency', 'N/A'))
+            
+            # Risk factors
+            st.markdown("**⚠️ Risk Factors:**")
+            meta = complaint.get('vision_data', {}).get('metadata', {})
+            if meta.get('near_school'): st.write("🏫 Near School")
+            if meta.get('heavy_traffic'): st.write("🚗 Heavy Traffic")
+            if meta.get('water_leak'): st.write("💧 Water Leak")
+            if meta.get('monsoon_critical'): st.write("🌧️ Monsoon Risk")
+        
+        st.divider()
+        
+        # Status Update Section (widgets only built once the authority opens it)
+        if not st.checkbox("🔄 Update Status", key=f"edit_{complaint.get('complaint_id')}"):
+            return
+        current_status = complaint.get('status', 'SUBMITTED')
+        st.selectbox(
+            "Change Status",
+            STATUS_KEYS,
+            index=STATUS_INDEX.get(current_status, 0),
+            key=f"status_{complaint.get('complaint_id')}"
+        )
+        
+        st.text_area(
+            "Authority Notes / Response",
+            value=complaint.get('authority_notes', ''),
+            placeholder="Add notes for the citizen...",
+            key=f"notes_{complaint.get('complaint_id')}"
+        )
+        
+        # Saved in button callbacks, which run before the card redraws with the new status
+        col_a, col_b = st.columns(2)
+        with col_a:
+            st.button("💾 Update Complaint", key=f"update_{complaint.get('complaint_id')}", type="primary",
+                      on_click=save_complaint_update, args=(complaint.get('complaint_id'),))
+        
+        with col_b:
+            if current_status != 'RESOLVED':
+                st.button("✅ Mark Resolved", key=f"resolve_{complaint.get('complaint_id')}", type="secondary",
+                          on_click=save_complaint_update, args=(complaint.get('complaint_id'), True))
 
 # ==========================================
 # 🏠 MAIN APP - SIDEBAR
@@ -403,14 +908,13 @@ if page == "🏠 Home":
     st.markdown("### 📰 Recent Complaints")
     history = load_memory()
     if history:
-        recent = sorted(history, key=lambda x: x.get('timestamp', ''), reverse=True)[:5]
+        recent = heapq.nlargest(5, history, key=lambda x: x.get('timestamp', ''))
         for r in recent:
-            status_info = COMPLAINT_STATUS.get(r.get('status', 'SUBMITTED'), COMPLAINT_STATUS['SUBMITTED'])
+            badge = STATUS_BADGE_HTML[r.get('status')]
             st.markdown(f"""
             <div class="complaint-card">
                 <strong>#{r.get('complaint_id', 'N/A')}</strong> - {r.get('issue_type', 'Unknown')} at {r.get('location', 'Unknown')}
-                <br><span style="background-color: {status_info['color']}; color: white; padding: 0.3rem 0.8rem; border-radius: 15px; font-size: 0.9rem;">
-                {status_info['label']}</span>
+                <br>{badge}
                 <span style="color: #666; font-size: 0.85rem; float: right;">{r.get('timestamp', '')}</span>
             </div>
             """, unsafe_allow_html=True)
@@ -441,8 +945,12 @@ elif page == "📝 File Complaint":
             help="Clear photos help us assess the problem faster"
         )
         
-        if uploaded_file:
-            st.image(uploaded_file, caption="Preview", width=400)
+        if uploaded_file and uploaded_file.size <= MAX_UPLOAD_MB * 1024 * 1024:
+            # Same prepared JPEG is reused for the preview and the AI pipeline
+            try:
+                st.image(load_uploaded_image(uploaded_file)["data"], caption="Preview", width=400)
+            except Exception:
+                st.warning("⚠️ Could not read this image. Please upload a valid JPG or PNG.")
         
         st.markdown("*Required fields")
         submitted = st.form_submit_button("🚀 Submit Complaint", type="primary")
@@ -450,96 +958,104 @@ elif page == "📝 File Complaint":
     if submitted:
         if not citizen_name or not citizen_phone or not location or not uploaded_file:
             st.error("⚠️ Please fill all required fields and upload a photo.")
+        elif uploaded_file.size > MAX_UPLOAD_MB * 1024 * 1024:
+            st.error(f"⚠️ Photo is too large. Please upload an image under {MAX_UPLOAD_MB} MB.")
         else:
-            with st.spinner("🤖 AI Agents are analyzing your complaint..."):
-                try:
-                    image = Image.open(uploaded_file)
+            try:
+                # Trace entries appear live while the agents run, then the box collapses
+                with st.status("🤖 AI Agents are analyzing your complaint...", expanded=True) as progress:
+                    image = load_uploaded_image(uploaded_file)
                     record, logs = run_audit_pipeline(
                         image, location, issue_type, 
-                        citizen_name, citizen_phone
+                        citizen_name, citizen_phone,
+                        progress=progress.markdown
                     )
-                    
                     if record:
-                        st.success(f"✅ Complaint Registered Successfully!")
+                        progress.update(label="✅ Analysis complete", state="complete", expanded=False)
+                    else:
+                        progress.update(label="❌ Analysis failed", state="error", expanded=False)
+                
+                if record:
+                    st.success(f"✅ Complaint Registered Successfully!")
+                    
+                    st.markdown(f"""
+                    <div style="background: #d4edda; padding: 1.5rem; border-radius: 10px; border-left: 4px solid #28a745; margin: 1rem 0;">
+                        <h3 style="margin: 0; color: #155724;">Your Complaint ID: {record['complaint_id']}</h3>
+                        <p style="margin: 0.5rem 0 0 0; color: #155724;">
+                            📋 Save this ID to track your complaint status<br>
+                            📱 You will receive SMS updates on: {citizen_phone}
+                        </p>
+                    </div>
+                    """, unsafe_allow_html=True)
+                    
+                    st.divider()
+                    
+                    # Show analysis results
+                    tab1, tab2, tab3 = st.tabs(["🎯 Risk Assessment", "🛠️ Action Plan", "🕵️ AI Analysis Trace"])
+                    
+                    with tab1:
+                        risk_score = record['risk_data']['risk_index']
+                        urgency = record['risk_data']['urgency']
+                        
+                        if risk_score >= 80:
+                            bg_color = "#ffebee"
+                            text_color = "#c62828"
+                        elif risk_score >= 50:
+                            bg_color = "#fff3e0"
+                            text_color = "#ef6c00"
+                        else:
+                            bg_color = "#e8f5e9"
+                            text_color = "#2e7d32"
                         
                         st.markdown(f"""
-                        <div style="background: #d4edda; padding: 1.5rem; border-radius: 10px; border-left: 4px solid #28a745; margin: 1rem 0;">
-                            <h3 style="margin: 0; color: #155724;">Your Complaint ID: {record['complaint_id']}</h3>
-                            <p style="margin: 0.5rem 0 0 0; color: #155724;">
-                                📋 Save this ID to track your complaint status<br>
-                                📱 You will receive SMS updates on: {citizen_phone}
-                            </p>
+                        <div style="background: {bg_color}; padding: 2rem; border-radius: 10px; text-align: center;">
+                            <div style="font-size: 0.9rem; color: #666;">CALCULATED RISK INDEX</div>
+                            <div style="font-size: 3rem; font-weight: bold; color: {text_color};">{risk_score}/100</div>
+                            <div style="font-size: 1.2rem; font-weight: bold; margin-top: 0.5rem;">
+                                PRIORITY: {urgency}
+                            </div>
                         </div>
                         """, unsafe_allow_html=True)
                         
-                        st.divider()
-                        
-                        # Show analysis results
-                        tab1, tab2, tab3 = st.tabs(["🎯 Risk Assessment", "🛠️ Action Plan", "🕵️ AI Analysis Trace"])
+                        st.write("")
                         
-                        with tab1:
-                            risk_score = record['risk_data']['risk_index']
-                            urgency = record['risk_data']['urgency']
-                            
-                            if risk_score >= 80:
-                                bg_color = "#ffebee"
-                                text_color = "#c62828"
-                            elif risk_score >= 50:
-                                bg_color = "#fff3e0"
-                                text_color = "#ef6c00"
-                            else:
-                                bg_color = "#e8f5e9"
-                                text_color = "#2e7d32"
-                            
-                            st.markdown(f"""
-                            <div style="background: {bg_color}; padding: 2rem; border-radius: 10px; text-align: center;">
-                                <div style="font-size: 0.9rem; color: #666;">CALCULATED RISK INDEX</div>
-                                <div style="font-size: 3rem; font-weight: bold; color: {text_color};">{risk_score}/100</div>
-                                <div style="font-size: 1.2rem; font-weight: bold; margin-top: 0.5rem;">
-                                    PRIORITY: {urgency}
-                                </div>
-                            </div>
-                            """, unsafe_allow_html=True)
-                            
-                            st.write("")
-                            
-                            v = record['vision_data']
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                st.metric("🏷️ Damage Type", v.get('damage_type', 'Unknown').title())
-                                st.metric("⚠️ Severity Level", f"{v.get('severity', 0)}/10")
-                            with col2:
-                                st.markdown("**🚨 Risk Factors Detected:**")
-                                meta = v.get('metadata', {})
-                                if meta.get('near_school'):
-                                    st.error("🏫 Near School Zone")
-                                if meta.get('heavy_traffic'):
-                                    st.warning("🚗 Heavy Traffic Area")
-                                if meta.get('water_leak'):
-                                    st.info("💧 Water Leakage Present")
-                                if meta.get('monsoon_critical'):
-                                    st.error("🌧️ Monsoon Critical")
+                        v = record['vision_data']
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            st.metric("🏷️ Damage Type", v.get('damage_type', 'Unknown').title())
+                            st.metric("⚠️ Severity Level", f"{v.get('severity', 0)}/10")
+                        with col2:
+                            st.markdown("**🚨 Risk Factors Detected:**")
+                            meta = v.get('metadata', {})
+                            if meta.get('near_school'):
+                                st.error("🏫 Near School Zone")
+                            if meta.get('heavy_traffic'):
+                                st.warning("🚗 Heavy Traffic Area")
+                            if meta.get('water_leak'):
+                                st.info("💧 Water Leakage Present")
+                            if meta.get('monsoon_critical'):
+                                st.error("🌧️ Monsoon Critical")
+                    
+                    with tab2:
+                        st.markdown("### 👷 Recommended Action Plan")
+                        st.info(record['action_plan'])
                         
-                        with tab2:
-                            st.markdown("### 👷 Recommended Action Plan")
-                            st.info(record['action_plan'])
+                        st.markdown("### 📍 Location Context")
+                        st.warning(record['context'])
+                    
+                    with tab3:
+                        st.markdown("### 🤖 AI Agent Execution Trace")
+                        for log in logs:
+                            st.markdown(log)
+                else:
+                    st.error("❌ Failed to process complaint. Please try again.")
+                    with st.expander("View Error Logs"):
+                        for log in logs:
+                            st.write(log)
                             
-                            st.markdown("### 📍 Location Context")
-                            st.warning(record['context'])
-                        
-                        with tab3:
-                            st.markdown("### 🤖 AI Agent Execution Trace")
-                            for log in logs:
-                                st.markdown(log)
-                    else:
-                        st.error("❌ Failed to process complaint. Please try again.")
-                        with st.expander("View Error Logs"):
-                            for log in logs:
-                                st.write(log)
-                                
-                except Exception as e:
-                    st.error(f"❌ Error: {str(e)}")
-                    st.info("Please try again or contact support if the issue persists.")
+            except Exception as e:
+                st.error(f"❌ Error: {str(e)}")
+                st.info("Please try again or contact support if the issue persists.")
 
 # ==========================================
 # PAGE 3: TRACK COMPLAINT
@@ -555,27 +1071,24 @@ elif page == "🔍 Track Complaint":
     
     if st.button("🔎 Search", type="primary"):
         if complaint_id_input:
-            history = load_memory()
-            complaint = next((c for c in history if c.get('complaint_id') == complaint_id_input), None)
+            complaint = get_complaint(complaint_id_input)
             
             if complaint:
                 st.success(f"✅ Complaint Found: #{complaint['complaint_id']}")
                 
                 # Status Timeline
                 st.markdown("### 📊 Status Timeline")
-                status_info = COMPLAINT_STATUS.get(complaint.get('status', 'SUBMITTED'), COMPLAINT_STATUS['SUBMITTED'])
-                st.markdown(f"""
-                <div style="background: {status_info['color']}; padding: 1rem; border-radius: 10px; text-align: center;">
-                    <h2 style="color: white; margin: 0;">{status_info['label']}</h2>
-                </div>
-                """, unsafe_allow_html=True)
+                st.markdown(
+                    STATUS_BANNER_HTML[complaint.get('status')],
+                    unsafe_allow_html=True
+                )
                 
                 st.write("")
                 
                 # Status History
                 for i, status_event in enumerate(reversed(complaint.get('status_history', []))):
                     icon = "🔵" if i == 0 else "⚪"
-                    st.markdown(f"{icon} **{COMPLAINT_STATUS.get(status_event.get('status', 'SUBMITTED'), COMPLAINT_STATUS['SUBMITTED'])['label']}** - {status_event.get('timestamp', '')}")
+                    st.markdown(f"{icon} **{STATUS_LABELS[status_event.get('status')]}** - {status_event.get('timestamp', '')}")
                 
                 st.divider()
                 
@@ -617,7 +1130,7 @@ elif page == "👮 Authority Dashboard":
     # Filters
     col1, col2, col3 = st.columns(3)
     with col1:
-        status_filter = st.selectbox("Filter by Status", ["All"] + list(COMPLAINT_STATUS.keys()))
+        status_filter = st.selectbox("Filter by Status", ["All"] + STATUS_KEYS)
     with col2:
         urgency_filter = st.selectbox("Filter by Urgency", ["All", "CRITICAL", "HIGH", "MODERATE"])
     with col3:
@@ -625,98 +1138,47 @@ elif page == "👮 Authority Dashboard":
     
     st.divider()
     
-    history = load_memory()
+    history, table = _memory_table(_memory_signature())
     
-    # Apply filters
-    filtered = history
+    # Apply filters (one boolean mask over the flat columns)
+    mask = np.ones(len(table), dtype=bool)
     if status_filter != "All":
-        filtered = [c for c in filtered if c.get('status') == status_filter]
+        mask &= table['status'].to_numpy() == status_filter
     if urgency_filter != "All":
-        filtered = [c for c in filtered if c.get('risk_data', {}).get('urgency') == urgency_filter]
+        mask &= table['urgency'].to_numpy() == urgency_filter
+    matches = np.flatnonzero(mask).tolist()
     
-    # Apply sorting
-    if sort_by == "Newest First":
-        filtered = sorted(filtered, key=lambda x: x.get('timestamp', ''), reverse=True)
-    elif sort_by == "Highest Risk":
-        filtered = sorted(filtered, key=lambda x: x.get('risk_data', {}).get('risk_index', 0), reverse=True)
-    else:
-        filtered = sorted(filtered, key=lambda x: x.get('timestamp', ''))
+    # Paginate so only one page of complaints builds widgets per rerun
+    total = len(matches)
+    col1, col2 = st.columns(2)
+    with col1:
+        page_size = st.selectbox("Complaints per page", DASHBOARD_PAGE_SIZES, index=DASHBOARD_PAGE_SIZES.index(DASHBOARD_PAGE_SIZE))
+    page_count = max(1, (total + page_size - 1) // page_size)
+    with col2:
+        page_num = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1)
+    start = (page_num - 1) * page_size
+    
+    # Apply sorting: a top-k heap only orders the records up to the current page
+    # (ties keep filing order, same as a stable sort)
+    sort_column = table['risk_index' if sort_by == "Highest Risk" else 'timestamp'].to_numpy()
+    select = heapq.nsmallest if sort_by == "Oldest First" else heapq.nlargest
+    ordered = select(start + page_size, matches, key=sort_column.__getitem__)
+    filtered = [history[i] for i in ordered[start:]]
     
-    st.markdown(f"### 📋 Showing {len(filtered)} Complaint(s)")
+    st.markdown(f"### 📋 Showing {len(filtered)} of {total} Complaint(s)")
     
     if not filtered:
         st.info("No complaints match the selected filters.")
     
     for complaint in filtered:
-        with st.expander(
-            f"🆔 {complaint.get('complaint_id', 'N/A')} | {complaint.get('issue_type', 'Unknown')} | "
-            f"Risk: {complaint.get('risk_data', {}).get('risk_index', 0)} | "
-            f"{COMPLAINT_STATUS.get(complaint.get('status', 'SUBMITTED'), COMPLAINT_STATUS['SUBMITTED'])['label']}"
-        ):
-            col1, col2 = st.columns([2, 1])
-            
-            with col1:
-                st.markdown("#### 📍 Location & Details")
-                st.write(f"**Location:** {complaint.get('location', 'N/A')}")
-                st.write(f"**Citizen:** {complaint.get('citizen_name', 'N/A')} ({complaint.get('citizen_phone', 'N/A')})")
-                st.write(f"**Filed On:** {complaint.get('timestamp', 'N/A')}")
-                st.write(f"**Issue:** {complaint.get('vision_data', {}).get('damage_type', 'Unknown')}")
-                st.write(f"**Description:** {complaint.get('vision_data', {}).get('description', 'No description')}")
-                
-                st.markdown("#### 🛠️ Action Plan")
-                st.info(complaint.get('action_plan', 'No action plan available'))
-            
-            with col2:
-                st.markdown("#### 🎯 Risk Metrics")
-                st.metric("Risk Score", f"{complaint.get('risk_data', {}).get('risk_index', 0)}/100")
-                st.metric("Severity", f"{complaint.get('vision_data', {}).get('severity', 0)}/10")
-                st.metric("Urgency", complaint.get('risk_data', {}).get('urgency', 'N/A'))
-                
-                # Risk factors
-                st.markdown("**⚠️ Risk Factors:**")
-                meta = complaint.get('vision_data', {}).get('metadata', {})
-                if meta.get('near_school'): st.write("🏫 Near School")
-                if meta.get('heavy_traffic'): st.write("🚗 Heavy Traffic")
-                if meta.get('water_leak'): st.write("💧 Water Leak")
-                if meta.get('monsoon_critical'): st.write("🌧️ Monsoon Risk")
-            
-            st.divider()
-            
-            # Status Update Section
-            st.markdown("#### 🔄 Update Status")
-            current_status = complaint.get('status', 'SUBMITTED')
-            new_status = st.selectbox(
-                "Change Status",
-                list(COMPLAINT_STATUS.keys()),
-                index=list(COMPLAINT_STATUS.keys()).index(current_status),
-                key=f"status_{complaint.get('complaint_id')}"
-            )
-            
-            authority_notes = st.text_area(
-                "Authority Notes / Response",
-                value=complaint.get('authority_notes', ''),
-                placeholder="Add notes for the citizen...",
-                key=f"notes_{complaint.get('complaint_id')}"
-            )
-            
-            col_a, col_b = st.columns(2)
-            with col_a:
-                if st.button("💾 Update Complaint", key=f"update_{complaint.get('complaint_id')}", type="primary"):
-                    if update_complaint_status(complaint.get('complaint_id'), new_status, authority_notes):
-                        st.success(f"✅ Updated to {COMPLAINT_STATUS[new_status]['label']}")
-                        st.rerun()
-            
-            with col_b:
-                if current_status != 'RESOLVED':
-                    if st.button("✅ Mark Resolved", key=f"resolve_{complaint.get('complaint_id')}", type="secondary"):
-                        if update_complaint_status(complaint.get('complaint_id'), 'RESOLVED', authority_notes):
-                            st.success("🎉 Complaint marked as RESOLVED!")
-                            st.rerun()
+        render_complaint_card(complaint.get('complaint_id'))
 
 # ==========================================
 # PAGE 5: ANALYTICS
 # ==========================================
 elif page == "📊 Analytics":
+    import pandas as pd
+    
     st.markdown("## 📊 System Analytics & Insights")
     
     history = load_memory()
@@ -724,13 +1186,15 @@ elif page == "📊 Analytics":
     if not history:
         st.info("📭 No data available yet. File some complaints to see analytics!")
     else:
-        # Top Metrics
+        # Top Metrics (from the same cached single-pass tally as the charts)
+        signature = _memory_signature()
+        counts = analytics_counts(signature)
         col1, col2, col3, col4 = st.columns(4)
         
         total = len(history)
-        resolved = len([h for h in history if h.get('status') == 'RESOLVED'])
-        pending = len([h for h in history if h.get('status') in ['SUBMITTED', 'ACKNOWLEDGED', 'IN_PROGRESS']])
-        critical = len([h for h in history if h.get('risk_data', {}).get('urgency') == 'CRITICAL'])
+        resolved = counts["status"]['RESOLVED']
+        pending = sum(counts["status"][s] for s in PENDING_STATUSES)
+        critical = counts["urgency"]['CRITICAL']
         
         with col1:
             st.metric("📋 Total Complaints", total)
@@ -744,38 +1208,20 @@ elif page == "📊 Analytics":
         
         st.divider()
         
-        # Charts
+        # Charts (cached per version of the complaint logs)
         col1, col2 = st.columns(2)
         
         with col1:
             st.markdown("### 📊 Status Distribution")
             try:
-                df = pd.DataFrame(history)
-                status_counts = df['status'].value_counts()
-                fig = px.pie(
-                    values=status_counts.values,
-                    names=[COMPLAINT_STATUS.get(s, COMPLAINT_STATUS['SUBMITTED'])['label'] for s in status_counts.index],
-                    color_discrete_sequence=px.colors.qualitative.Set3
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                st.plotly_chart(build_status_chart(signature), use_container_width=True)
             except Exception as e:
                 st.error(f"Could not generate status chart: {str(e)}")
         
         with col2:
             st.markdown("### 🏷️ Issue Type Breakdown")
             try:
-                df = pd.DataFrame(history)
-                issue_counts = df['issue_type'].value_counts()
-                fig = px.bar(
-                    x=issue_counts.values,
-                    y=issue_counts.index,
-                    orientation='h',
-                    color=issue_counts.values,
-                    color_continuous_scale='Reds',
-                    labels={'x': 'Count', 'y': 'Issue Type'}
-                )
-                fig.update_layout(showlegend=False)
-                st.plotly_chart(fig, use_container_width=True)
+                st.plotly_chart(build_issue_chart(signature), use_container_width=True)
             except Exception as e:
                 st.error(f"Could not generate issue type chart: {str(e)}")
         
@@ -784,66 +1230,35 @@ elif page == "📊 Analytics":
         # Location Analysis
         st.markdown("### 📍 Complaint Hotspots")
         try:
-            df = pd.DataFrame(history)
-            location_counts = df['location'].value_counts().head(10)
-            fig = px.bar(
-                x=location_counts.values,
-                y=location_counts.index,
-                orientation='h',
-                title="Top 10 Locations by Complaint Volume",
-                color=location_counts.values,
-                color_continuous_scale='Oranges',
-                labels={'x': 'Number of Complaints', 'y': 'Location'}
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(build_hotspots_chart(signature), use_container_width=True)
         except Exception as e:
             st.error(f"Could not generate hotspots chart: {str(e)}")
         
         # Risk Analysis
         st.markdown("### ⚠️ Risk Score Distribution")
         try:
-            risk_scores = [h.get('risk_data', {}).get('risk_index', 0) for h in history]
-            fig = px.histogram(
-                x=risk_scores,
-                nbins=20,
-                title="Distribution of Risk Scores",
-                color_discrete_sequence=['#FF6B6B'],
-                labels={'x': 'Risk Score', 'y': 'Frequency'}
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(build_risk_chart(signature), use_container_width=True)
         except Exception as e:
             st.error(f"Could not generate risk distribution chart: {str(e)}")
         
         # Time Series Analysis
         st.markdown("### 📈 Complaints Over Time")
         try:
-            df = pd.DataFrame(history)
-            df['date'] = pd.to_datetime(df['timestamp']).dt.date
-            daily_counts = df.groupby('date').size().reset_index(name='count')
-            
-            fig = px.line(
-                daily_counts,
-                x='date',
-                y='count',
-                title="Daily Complaint Volume",
-                markers=True,
-                labels={'date': 'Date', 'count': 'Number of Complaints'}
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(build_timeline_chart(signature), use_container_width=True)
         except Exception as e:
             st.error(f"Could not generate time series chart: {str(e)}")
         
         # Detailed Table
         st.markdown("### 📋 Complete Complaint Registry")
         try:
+            _, table = _memory_table(signature)
             display_df = pd.DataFrame({
-                "ID": [h.get('complaint_id', 'N/A') for h in history],
-                "Location": [h.get('location', 'N/A') for h in history],
-                "Issue": [h.get('issue_type', 'N/A') for h in history],
-                "Risk": [h.get('risk_data', {}).get('risk_index', 0) for h in history],
-                "Status": [COMPLAINT_STATUS.get(h.get('status', 'SUBMITTED'), COMPLAINT_STATUS['SUBMITTED'])['label'] for h in history],
-                "Date": [h.get('timestamp', 'N/A') for h in history]
+                "ID": table['complaint_id'],
+                "Location": table['location'],
+                "Issue": table['issue_type'],
+                "Risk": table['risk_index'],
+                "Status": table['status'].map(STATUS_LABELS),
+                "Date": table['timestamp'].replace('', 'N/A')
             })
             st.dataframe(display_df, use_container_width=True, hide_index=True)
         except Exception as e: